@@ -0,0 +1,65 @@
+"""Export the fine-tuned model to ONNX for ONNX Runtime inference
+
+Usage:
+    python export_onnx.py                # export to ./onnx_model, INT8 unless QUANTIZE_MODEL=false or CUDA is available
+    python export_onnx.py --no-quantize  # export full-precision weights
+"""
+import argparse
+import os
+import logging
+from pathlib import Path
+from optimum.onnxruntime import ORTModelForSeq2SeqLM
+import onnxruntime
+from onnxruntime.quantization import quantize_dynamic, QuantType
+from transformers import AutoTokenizer
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MODEL_PATH = "./ai_paragraph_titler_model"
+ONNX_MODEL_PATH = os.getenv("ONNX_MODEL_PATH", "./onnx_model")
+QUANTIZE_MODEL = os.getenv("QUANTIZE_MODEL", "true").lower() == "true"
+# main.py checks for this file to keep quantized graphs off the GPU
+ONNX_QUANTIZED_MARKER = "QUANTIZED"
+
+
+def export_model(output_dir: str):
+    """Export the encoder/decoder graphs and tokenizer to output_dir"""
+    logger.info(f"Exporting {MODEL_PATH} to ONNX...")
+    model = ORTModelForSeq2SeqLM.from_pretrained(MODEL_PATH, export=True)
+    model.save_pretrained(output_dir)
+    # Fresh FP32 graphs; drop the marker left by an earlier quantized export
+    Path(output_dir, ONNX_QUANTIZED_MARKER).unlink(missing_ok=True)
+    AutoTokenizer.from_pretrained(MODEL_PATH).save_pretrained(output_dir)
+    logger.info(f"ONNX model saved to {output_dir}")
+
+
+def quantize_model(output_dir: str):
+    """Quantize the MatMul weights of every exported graph to INT8 in place"""
+    for onnx_file in Path(output_dir).glob("*.onnx"):
+        logger.info(f"Quantizing {onnx_file.name}...")
+        quantized_file = onnx_file.with_suffix(".quant.onnx")
+        quantize_dynamic(onnx_file, quantized_file, weight_type=QuantType.QInt8)
+        quantized_file.replace(onnx_file)
+    Path(output_dir, ONNX_QUANTIZED_MARKER).touch()
+    logger.info("Quantization complete")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the titler model to ONNX")
+    parser.add_argument("--output", default=ONNX_MODEL_PATH, help="Output directory")
+    parser.add_argument("--quantize", action=argparse.BooleanOptionalAction, default=QUANTIZE_MODEL,
+                        help="Apply INT8 dynamic quantization (default from QUANTIZE_MODEL)")
+    args = parser.parse_args()
+
+    # The CUDA provider has no kernels for dynamically quantized graphs
+    if args.quantize and "CUDAExecutionProvider" in onnxruntime.get_available_providers():
+        logger.warning("CUDA is available, skipping INT8 quantization; the GPU runs the FP32 graphs faster")
+        args.quantize = False
+
+    export_model(args.output)
+    if args.quantize:
+        quantize_model(args.output)
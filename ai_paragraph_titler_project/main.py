@@ -1,15 +1,22 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks, Query, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from pydantic import BaseModel, Field, EmailStr
-from transformers import pipeline
+from pydantic import BaseModel, ConfigDict, Field, EmailStr
+from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+from optimum.onnxruntime import ORTModelForSeq2SeqLM
+import onnxruntime
 from typing import List, Optional
 from contextlib import asynccontextmanager
+from cachetools import LRUCache, TTLCache
+import asyncio
+import hashlib
 import time
 import logging
-import mysql.connector
-from mysql.connector import pooling
+import aiomysql
 import bcrypt
+import torch
 import jwt
 from datetime import datetime, timedelta
 import os
@@ -23,40 +30,151 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Global variables
-summarizer = None
+model = None
+tokenizer = None
 db_pool = None
+batch_workers = []
 
 # Configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-this-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 hours
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+TOKEN_CACHE_TTL_SECONDS = int(os.getenv("TOKEN_CACHE_TTL_SECONDS", "10"))
+MODEL_PATH = "./ai_paragraph_titler_model"
+ONNX_MODEL_PATH = os.getenv("ONNX_MODEL_PATH", "./onnx_model")
+# Written by export_onnx.py next to INT8 graphs
+ONNX_QUANTIZED_MARKER = "QUANTIZED"
+DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+# The device the model actually runs on. ONNX Runtime only gets CUDA from
+# onnxruntime-gpu, and its CUDA provider has no kernels for dynamically
+# quantized graphs, so either case keeps the ONNX model on CPU.
+USE_ONNX = os.path.isdir(ONNX_MODEL_PATH)
+ONNX_CUDA_AVAILABLE = "CUDAExecutionProvider" in onnxruntime.get_available_providers()
+ONNX_QUANTIZED = os.path.exists(os.path.join(ONNX_MODEL_PATH, ONNX_QUANTIZED_MARKER))
+if USE_ONNX and (not ONNX_CUDA_AVAILABLE or ONNX_QUANTIZED):
+    MODEL_DEVICE = "cpu"
+else:
+    MODEL_DEVICE = DEVICE
+# Each worker is a separate process with its own model copy, threads and
+# database pool; --reload only works with a single worker. On GPU a single
+# worker keeps one model copy on the device instead of one per process.
+UVICORN_RELOAD = os.getenv("UVICORN_RELOAD", "false").lower() == "true"
+# CPUs this process may run on (respects taskset/cpuset limits on Linux)
+CPU_COUNT = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+DEFAULT_WORKERS = 1 if MODEL_DEVICE == "cuda" else CPU_COUNT
+UVICORN_WORKERS = 1 if UVICORN_RELOAD else int(os.getenv("UVICORN_WORKERS", str(DEFAULT_WORKERS)))
+# Processes sharing the thread and connection budgets below. `python main.py`
+# exports UVICORN_WORKERS to its workers; when the app is started any other
+# way (uvicorn main:app, gunicorn) without it, take the whole budget.
+WORKER_PROCESSES = max(1, int(os.getenv("UVICORN_WORKERS", "1")))
+SUMMARIZER_BATCH_SIZE = int(os.getenv("SUMMARIZER_BATCH_SIZE", "8"))
+# INT8 weights: applied at load time for PyTorch, at export time
+# (export_onnx.py) for the ONNX model
+QUANTIZE_MODEL = os.getenv("QUANTIZE_MODEL", "true").lower() == "true"
+TORCH_COMPILE = os.getenv("TORCH_COMPILE", "false").lower() == "true"
+TORCH_NUM_THREADS = int(os.getenv("TORCH_NUM_THREADS", str(max(1, CPU_COUNT // WORKER_PROCESSES))))
+INFERENCE_SLOTS = int(os.getenv("INFERENCE_SLOTS", "1"))
+BATCH_WAIT_MS = float(os.getenv("BATCH_WAIT_MS", "15"))
+TITLE_CACHE_SIZE = int(os.getenv("TITLE_CACHE_SIZE", "10000"))
+MAX_PARAGRAPH_LENGTH = 10_000
+MAX_PARAGRAPHS = 50
 
 # Database configuration
+# Each uvicorn worker has its own pool, so DB_POOL_SIZE * workers should stay
+# below the server's max_connections and roughly match the expected number
+# of concurrent requests. The default splits ~100 connections across workers,
+# and the pool never opens more than maxsize connections at startup.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", str(max(1, 100 // WORKER_PROCESSES))))
+DB_POOL_MIN_SIZE = min(int(os.getenv("DB_POOL_MIN_SIZE", "1")), DB_POOL_SIZE)
 DB_CONFIG = {
     "host": os.getenv("DB_HOST", "localhost"),
     "user": os.getenv("DB_USER", "root"),
     "password": os.getenv("DB_PASSWORD", ""),
-    "database": os.getenv("DB_NAME", "paragraph_titler_db"),
-    "pool_name": "mypool",
-    "pool_size": 5
+    "db": os.getenv("DB_NAME", "paragraph_titler_db"),
+    "minsize": DB_POOL_MIN_SIZE,
+    "maxsize": DB_POOL_SIZE,
+    # Replace idle connections before MySQL's wait_timeout drops them
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    # Read-only checkouts must not leave a transaction open, otherwise the
+    # pool closes the connection on release instead of reusing it
+    "autocommit": True
 }
 
+# MySQL error code for a UNIQUE key violation
+ER_DUP_ENTRY = 1062
+
 # Security
 security = HTTPBearer()
 
+# Reused for every token check; the key is encoded once up front
+jwt_decoder = jwt.PyJWT()
+SECRET_KEY_BYTES = SECRET_KEY.encode('utf-8')
+JWT_DECODE_OPTIONS = {"require": ["exp"], "verify_aud": False}
+
+# Authenticated users by token hash, so repeat requests skip the JWT decode
+# and the user lookup. Entries live for TOKEN_CACHE_TTL_SECONDS.
+token_cache = TTLCache(maxsize=10000, ttl=TOKEN_CACHE_TTL_SECONDS)
+
+# Paragraphs waiting for the model, as (paragraph, max_length, min_length, future).
+# INFERENCE_SLOTS batch workers drain it, which also caps concurrent model calls.
+inference_queue = asyncio.Queue()
+
+# Generation is deterministic, so titles are cached per (paragraph, lengths).
+# Only touched from the event loop thread, so no lock is needed.
+title_cache = LRUCache(maxsize=TITLE_CACHE_SIZE)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Load the model and database pool on startup"""
-    global summarizer, db_pool
+    global model, tokenizer, db_pool
     try:
         logger.info("Loading AI model...")
-        summarizer = pipeline(
-            "summarization", model="./ai_paragraph_titler_model")
+        # One intra-op pool sized to the machine, no nested inter-op threads
+        torch.set_num_threads(TORCH_NUM_THREADS)
+        # Can only be set once per process, so skip it when the app restarts
+        if torch.get_num_interop_threads() != 1:
+            torch.set_num_interop_threads(1)
+        tokenizer = AutoTokenizer.from_pretrained(MODEL_PATH)
+        if USE_ONNX:
+            provider = "CUDAExecutionProvider" if MODEL_DEVICE == "cuda" else "CPUExecutionProvider"
+            if DEVICE == "cuda" and not ONNX_CUDA_AVAILABLE:
+                logger.warning("CUDAExecutionProvider not available, install onnxruntime-gpu to run ONNX on the GPU; using CPU")
+            elif DEVICE == "cuda" and ONNX_QUANTIZED:
+                logger.warning("ONNX model is INT8 quantized, which CUDA cannot run efficiently; using CPU. Re-export with --no-quantize for the GPU")
+            # Same per-worker thread budget as the PyTorch path
+            session_options = onnxruntime.SessionOptions()
+            session_options.intra_op_num_threads = TORCH_NUM_THREADS
+            session_options.inter_op_num_threads = 1
+            model = ORTModelForSeq2SeqLM.from_pretrained(
+                ONNX_MODEL_PATH, provider=provider, session_options=session_options)
+            logger.info(f"Loaded ONNX Runtime model on {provider}")
+        else:
+            # Run export_onnx.py to build the ONNX model
+            logger.warning(f"ONNX model not found at {ONNX_MODEL_PATH}, falling back to PyTorch")
+            model = AutoModelForSeq2SeqLM.from_pretrained(
+                MODEL_PATH,
+                attn_implementation="sdpa",
+                dtype=torch.float16 if MODEL_DEVICE == "cuda" else None
+            ).to(MODEL_DEVICE)
+            logger.info(f"Loaded PyTorch model on {MODEL_DEVICE}")
+            # Dynamic quantization only has CPU kernels
+            if QUANTIZE_MODEL and MODEL_DEVICE == "cpu":
+                # INT8 weights for every Linear layer, activations quantized on the fly
+                model = torch.ao.quantization.quantize_dynamic(
+                    model, {torch.nn.Linear}, dtype=torch.qint8)
+                logger.info("Applied INT8 dynamic quantization")
+            if TORCH_COMPILE:
+                # generate() calls forward() on the module itself, so compile that
+                model.forward = torch.compile(model.forward)
+                logger.info("Compiled model forward pass")
         logger.info("Model loaded successfully!")
+        batch_workers.extend(
+            asyncio.create_task(batch_worker()) for _ in range(INFERENCE_SLOTS))
         
         logger.info("Creating database connection pool...")
-        db_pool = mysql.connector.pooling.MySQLConnectionPool(**DB_CONFIG)
+        db_pool = await aiomysql.create_pool(**DB_CONFIG)
         logger.info("Database pool created successfully!")
     except Exception as e:
         logger.error(f"Failed to initialize: {str(e)}")
@@ -66,6 +184,17 @@ async def lifespan(app: FastAPI):
 
     # Cleanup
     logger.info("Shutting down...")
+    for worker in batch_workers:
+        worker.cancel()
+    await asyncio.gather(*batch_workers, return_exceptions=True)
+    batch_workers.clear()
+    # Fail whatever is still queued so waiting requests don't hang
+    queued = []
+    while not inference_queue.empty():
+        queued.append(inference_queue.get_nowait())
+    fail_pending(queued, RuntimeError("Server is shutting down"))
+    db_pool.close()
+    await db_pool.wait_closed()
 
 
 # Initialize FastAPI app
@@ -73,7 +202,8 @@ app = FastAPI(
     title="AI Paragraph Titler API",
     description="Generate AI-powered titles for paragraphs with user authentication",
     version="2.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS
@@ -85,29 +215,53 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress larger responses such as /saved-results pages
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 
 # ==================== Database Functions ====================
 
-def get_db_connection():
-    """Get a connection from the pool"""
+@asynccontextmanager
+async def get_db_connection():
+    """Get a connection from the pool and release it when done"""
+    acquired = False
     try:
-        return db_pool.get_connection()
+        async with db_pool.acquire() as conn:
+            acquired = True
+            yield conn
     except Exception as e:
+        # Errors raised while using the connection belong to the caller
+        if acquired:
+            raise
         logger.error(f"Database connection error: {str(e)}")
         raise HTTPException(status_code=500, detail="Database connection failed")
 
 
+async def update_last_login(user_id: int):
+    """Record the login time for a user, run after the response is sent"""
+    try:
+        async with get_db_connection() as conn, conn.cursor() as cursor:
+            await cursor.execute(
+                "UPDATE users SET last_login = NOW() WHERE user_id = %s",
+                (user_id,)
+            )
+    except Exception as e:
+        logger.error(f"Failed to update last login for user {user_id}: {str(e)}")
+
+
 # ==================== Auth Functions ====================
 
-def hash_password(password: str) -> str:
-    """Hash a password using bcrypt"""
-    salt = bcrypt.gensalt()
-    return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
+async def hash_password(password: str) -> str:
+    """Hash a password using bcrypt in a worker thread"""
+    salt = bcrypt.gensalt(BCRYPT_ROUNDS)
+    hashed = await asyncio.to_thread(bcrypt.hashpw, password.encode('utf-8'), salt)
+    return hashed.decode('utf-8')
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a password against its hash"""
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password against its hash in a worker thread"""
+    return await asyncio.to_thread(
+        bcrypt.checkpw, plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
 
 
 def create_access_token(data: dict) -> str:
@@ -122,17 +276,27 @@ def create_access_token(data: dict) -> str:
 def decode_token(token: str) -> dict:
     """Decode and verify JWT token"""
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt_decoder.decode(
+            token, SECRET_KEY_BYTES, algorithms=[ALGORITHM], options=JWT_DECODE_OPTIONS)
         return payload
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token has expired")
-    except jwt.JWTError:
+    except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Get current authenticated user"""
     token = credentials.credentials
+    cache_key = hashlib.sha256(token.encode('utf-8')).digest()
+    cached = token_cache.get(cache_key)
+    if cached is not None:
+        user, expires_at = cached
+        if expires_at > time.time():
+            return user
+        token_cache.pop(cache_key, None)
+        raise HTTPException(status_code=401, detail="Token has expired")
+
     payload = decode_token(token)
     user_id = payload.get("user_id")
     
@@ -140,28 +304,30 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         raise HTTPException(status_code=401, detail="Invalid authentication")
     
     # Fetch user from database
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    try:
-        cursor.execute(
+    async with get_db_connection() as conn, conn.cursor(aiomysql.DictCursor) as cursor:
+        await cursor.execute(
             "SELECT user_id, username, email, first_name, last_name, is_active FROM users WHERE user_id = %s",
             (user_id,)
         )
-        user = cursor.fetchone()
-        
-        if not user or not user['is_active']:
-            raise HTTPException(status_code=401, detail="User not found or inactive")
-        
-        return user
-    finally:
-        cursor.close()
-        conn.close()
+        user = await cursor.fetchone()
+    
+    if not user or not user['is_active']:
+        raise HTTPException(status_code=401, detail="User not found or inactive")
+    
+    token_cache[cache_key] = (user, payload["exp"])
+    return user
 
 
 # ==================== Pydantic Models ====================
 
+# Request bodies reject unknown fields and cap string sizes to bound the work
+# a single request can cause
+REQUEST_MODEL_CONFIG = ConfigDict(extra='forbid', str_max_length=MAX_PARAGRAPH_LENGTH)
+
+
 class UserRegister(BaseModel):
+    model_config = REQUEST_MODEL_CONFIG
+
     username: str = Field(..., min_length=3, max_length=50)
     email: EmailStr
     password: str = Field(..., min_length=6)
@@ -170,6 +336,8 @@ class UserRegister(BaseModel):
 
 
 class UserLogin(BaseModel):
+    model_config = REQUEST_MODEL_CONFIG
+
     username: str
     password: str
 
@@ -191,6 +359,8 @@ class TokenResponse(BaseModel):
 
 
 class ParagraphRequest(BaseModel):
+    model_config = REQUEST_MODEL_CONFIG
+
     paragraph: str = Field(..., min_length=1)
     max_length: Optional[int] = Field(15, ge=5, le=50)
     min_length: Optional[int] = Field(5, ge=1, le=20)
@@ -198,7 +368,9 @@ class ParagraphRequest(BaseModel):
 
 
 class MultipleParagraphsRequest(BaseModel):
-    paragraphs: List[str] = Field(..., min_length=1)
+    model_config = REQUEST_MODEL_CONFIG
+
+    paragraphs: List[str] = Field(..., min_length=1, max_length=MAX_PARAGRAPHS)
     max_length: Optional[int] = Field(15, ge=5, le=50)
     min_length: Optional[int] = Field(5, ge=1, le=20)
     save_results: Optional[bool] = Field(True)
@@ -233,61 +405,46 @@ class MultipleTitlesResponse(BaseModel):
 class SavedResultsResponse(BaseModel):
     success: bool
     data: List[TitleResult]
-    total_results: int
+    total_results: Optional[int] = None
+    next_cursor: Optional[int] = None
     message: str
 
 
 # ==================== Helper Functions ====================
 
-def evaluate_title_status(title: str, paragraph: str) -> tuple[str, str]:
+# Lookup tables indexed by word count; longer inputs fall through to
+# "verbose" and "high" respectively
+TITLE_STATUS_BY_WORDS = ("short",) * 3 + ("optimal",) * 6
+CONFIDENCE_BY_PARAGRAPH_WORDS = ("low",) * 10 + ("medium",) * 40
+
+
+def evaluate_title_status(title: str, paragraph_words: int) -> tuple[str, str]:
     """Evaluate the quality/status of generated title"""
-    title_words = len(title.split())
-    paragraph_words = len(paragraph.split())
+    if title.endswith('...'):
+        return "truncated", "medium"
 
-    if title_words < 3:
-        return "short", "medium"
-    elif title_words >= 3 and title_words <= 8:
-        status = "optimal"
+    title_words = len(title.split())
+    if title_words < len(TITLE_STATUS_BY_WORDS):
+        status = TITLE_STATUS_BY_WORDS[title_words]
     else:
         status = "verbose"
 
-    if paragraph_words < 10:
-        confidence = "low"
-    elif paragraph_words < 50:
-        confidence = "medium"
+    if status == "short":
+        return status, "medium"
+
+    if paragraph_words < len(CONFIDENCE_BY_PARAGRAPH_WORDS):
+        confidence = CONFIDENCE_BY_PARAGRAPH_WORDS[paragraph_words]
     else:
         confidence = "high"
 
-    if title.endswith(('...', '..', '..')):
-        status = "truncated"
-        confidence = "medium"
-
     return status, confidence
 
 
-def generate_title(paragraph: str, max_length: int, min_length: int) -> dict:
-    """Generate title for a single paragraph"""
-    start_time = time.time()
-
-    if not paragraph or len(paragraph.strip()) == 0:
-        raise ValueError("Paragraph cannot be empty")
-
-    try:
-        result = summarizer(
-            paragraph,
-            max_length=max_length,
-            min_length=min_length,
-            do_sample=False
-        )[0]
-        title = result['summary_text']
-    except Exception as e:
-        logger.error(f"Error generating title: {str(e)}")
-        raise ValueError(f"Failed to generate title: {str(e)}")
-
-    processing_time = (time.time() - start_time) * 1000
+def build_title_result(paragraph: str, title: str, processing_time: float) -> dict:
+    """Build the result payload for a generated title"""
     char_count = len(paragraph)
     word_count = len(paragraph.split())
-    status, confidence = evaluate_title_status(title, paragraph)
+    status, confidence = evaluate_title_status(title, word_count)
 
     return {
         "title": title,
@@ -300,13 +457,187 @@ def generate_title(paragraph: str, max_length: int, min_length: int) -> dict:
     }
 
 
-def save_result_to_db(user_id: int, result_data: dict) -> int:
-    """Save a title result to the database"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
+def summarize(texts: List[str], max_length: int, min_length: int) -> List[str]:
+    """Run the model over a list of texts and return the decoded summaries"""
+    summaries = []
+    for i in range(0, len(texts), SUMMARIZER_BATCH_SIZE):
+        inputs = tokenizer(
+            texts[i:i + SUMMARIZER_BATCH_SIZE],
+            padding=True,
+            truncation=True,
+            max_length=model.config.max_position_embeddings,
+            return_tensors="pt"
+        ).to(model.device)
+        output_ids = model.generate(
+            **inputs,
+            max_length=max_length,
+            min_length=min_length,
+            do_sample=False
+        )
+        summaries.extend(tokenizer.batch_decode(output_ids, skip_special_tokens=True))
+    return summaries
+
+
+def title_cache_key(paragraph: str, max_length: int, min_length: int) -> tuple:
+    """Build the title cache key for a paragraph and generation lengths"""
+    digest = hashlib.blake2b(paragraph.encode('utf-8'), digest_size=16).digest()
+    return digest, max_length, min_length
+
+
+def fail_pending(items: list, error: Exception):
+    """Fail the futures of queued paragraphs that have no result yet"""
+    for item in items:
+        if not item[3].done():
+            item[3].set_exception(error)
+
+
+async def collect_batch() -> list:
+    """Wait for a queued paragraph, then gather more until the batch is full or BATCH_WAIT_MS passes"""
+    loop = asyncio.get_running_loop()
+    items = [await inference_queue.get()]
+    deadline = loop.time() + BATCH_WAIT_MS / 1000
+
+    getter = None
+    try:
+        while len(items) < SUMMARIZER_BATCH_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            # asyncio.wait never drops an item the way a timed-out wait_for can
+            getter = asyncio.ensure_future(inference_queue.get())
+            done, _ = await asyncio.wait({getter}, timeout=timeout)
+            if getter not in done:
+                getter.cancel()
+                break
+            items.append(getter.result())
+    except asyncio.CancelledError:
+        if getter is not None:
+            getter.cancel()
+        fail_pending(items, RuntimeError("Server is shutting down"))
+        raise
+
+    return items
+
+
+async def batch_worker():
+    """Run queued paragraphs through the model in micro-batches"""
+    while True:
+        items = await collect_batch()
+
+        # Paragraphs with the same lengths share one generate() call; callers
+        # that already went away are skipped
+        groups = {}
+        for item in items:
+            if not item[3].cancelled():
+                groups.setdefault((item[1], item[2]), []).append(item)
+
+        try:
+            for (max_length, min_length), group in groups.items():
+                try:
+                    titles = await asyncio.to_thread(
+                        summarize, [item[0] for item in group], max_length, min_length)
+                except Exception as e:
+                    fail_pending(group, e)
+                    continue
+
+                for item, title in zip(group, titles):
+                    if not item[3].done():
+                        item[3].set_result(title)
+        except asyncio.CancelledError:
+            fail_pending(items, RuntimeError("Server is shutting down"))
+            raise
+
+
+async def enqueue_summaries(texts: List[str], max_length: int, min_length: int) -> List[str]:
+    """Queue texts for the batch workers and wait for their summaries"""
+    loop = asyncio.get_running_loop()
+    futures = []
+    for text in texts:
+        future = loop.create_future()
+        inference_queue.put_nowait((text, max_length, min_length, future))
+        futures.append(future)
+
+    try:
+        return await asyncio.gather(*futures)
+    except BaseException:
+        # Stop waiting on the rest; batch workers skip cancelled items
+        for future in futures:
+            if not future.done():
+                future.cancel()
+        raise
+
+
+async def generate_title(paragraph: str, max_length: int, min_length: int) -> dict:
+    """Generate title for a single paragraph"""
+    start_time = time.time()
+
+    if not paragraph or len(paragraph.strip()) == 0:
+        raise ValueError("Paragraph cannot be empty")
+
+    cache_key = title_cache_key(paragraph, max_length, min_length)
+    title = title_cache.get(cache_key)
+    if title is not None:
+        return build_title_result(paragraph, title, 0.0)
+
     try:
-        cursor.execute("""
+        titles = await enqueue_summaries([paragraph], max_length, min_length)
+        title = titles[0]
+    except Exception as e:
+        logger.error(f"Error generating title: {str(e)}")
+        raise ValueError(f"Failed to generate title: {str(e)}")
+
+    title_cache[cache_key] = title
+
+    processing_time = (time.time() - start_time) * 1000
+    return build_title_result(paragraph, title, processing_time)
+
+
+async def generate_titles(paragraphs: List[str], max_length: int, min_length: int) -> List[dict]:
+    """Generate titles for several paragraphs through the batch workers"""
+    texts = [p for p in paragraphs if p.strip()]
+    keys = [title_cache_key(p, max_length, min_length) for p in texts]
+
+    # Only paragraphs missing from the cache go to the model, once each
+    titles = {}
+    pending = {}
+    for paragraph, key in zip(texts, keys):
+        if key in titles or key in pending:
+            continue
+        title = title_cache.get(key)
+        if title is not None:
+            titles[key] = title
+        else:
+            pending[key] = paragraph
+
+    processing_time = 0.0
+    if pending:
+        start_time = time.time()
+
+        try:
+            generated = await enqueue_summaries(
+                list(pending.values()), max_length, min_length)
+        except Exception as e:
+            logger.error(f"Error generating titles: {str(e)}")
+            raise ValueError(f"Failed to generate titles: {str(e)}")
+
+        for key, title in zip(pending, generated):
+            title_cache[key] = title
+            titles[key] = title
+
+        # Every generated paragraph gets an equal share of the batch time
+        processing_time = (time.time() - start_time) * 1000 / len(pending)
+
+    return [
+        build_title_result(
+            paragraph, titles[key], processing_time if key in pending else 0.0)
+        for paragraph, key in zip(texts, keys)
+    ]
+
+
+async def save_result_to_db(user_id: int, result_data: dict) -> int:
+    """Save a title result to the database"""
+    async with get_db_connection() as conn, conn.cursor() as cursor:
+        await cursor.execute("""
             INSERT INTO saved_results 
             (user_id, paragraph, generated_title, status, confidence, 
              processing_time_ms, character_count, word_count)
@@ -321,11 +652,39 @@ def save_result_to_db(user_id: int, result_data: dict) -> int:
             result_data['character_count'],
             result_data['word_count']
         ))
-        conn.commit()
         return cursor.lastrowid
-    finally:
-        cursor.close()
-        conn.close()
+
+
+async def save_results_to_db(user_id: int, results_data: List[dict]) -> List[int]:
+    """Save several title results with a single multi-row INSERT"""
+    if not results_data:
+        return []
+
+    placeholders = ", ".join(["(%s, %s, %s, %s, %s, %s, %s, %s)"] * len(results_data))
+    values = []
+    for result_data in results_data:
+        values.extend((
+            user_id,
+            result_data['paragraph'],
+            result_data['title'],
+            result_data['status'],
+            result_data['confidence'],
+            result_data['processing_time_ms'],
+            result_data['character_count'],
+            result_data['word_count']
+        ))
+
+    async with get_db_connection() as conn, conn.cursor() as cursor:
+        await cursor.execute(f"""
+            INSERT INTO saved_results 
+            (user_id, paragraph, generated_title, status, confidence, 
+             processing_time_ms, character_count, word_count)
+            VALUES {placeholders}
+        """, values)
+        # A multi-row INSERT gets consecutive ids starting at lastrowid
+        first_id = cursor.lastrowid
+
+    return list(range(first_id, first_id + len(results_data)))
 
 
 # ==================== API Endpoints ====================
@@ -336,7 +695,7 @@ async def root():
     return {
         "status": "running",
         "message": "AI Paragraph Titler API is running",
-        "model_loaded": summarizer is not None,
+        "model_loaded": model is not None,
         "database_connected": db_pool is not None
     }
 
@@ -344,118 +703,98 @@ async def root():
 @app.post("/register", response_model=TokenResponse)
 async def register(user: UserRegister):
     """Register a new user"""
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
+    hashed_pw = await hash_password(user.password)
     
-    try:
-        # Check if username or email already exists
-        cursor.execute(
-            "SELECT user_id FROM users WHERE username = %s OR email = %s",
-            (user.username, user.email)
-        )
-        if cursor.fetchone():
-            raise HTTPException(status_code=400, detail="Username or email already exists")
-        
-        # Hash password and create user
-        hashed_pw = hash_password(user.password)
-        cursor.execute("""
-            INSERT INTO users (username, email, password_hash, first_name, last_name)
-            VALUES (%s, %s, %s, %s, %s)
-        """, (user.username, user.email, hashed_pw, user.first_name, user.last_name))
-        conn.commit()
+    async with get_db_connection() as conn, conn.cursor() as cursor:
+        # The UNIQUE keys on username and email reject duplicates, so no
+        # separate existence check is needed
+        try:
+            await cursor.execute("""
+                INSERT INTO users (username, email, password_hash, first_name, last_name)
+                VALUES (%s, %s, %s, %s, %s)
+            """, (user.username, user.email, hashed_pw, user.first_name, user.last_name))
+        except aiomysql.IntegrityError as e:
+            if e.args[0] == ER_DUP_ENTRY:
+                raise HTTPException(status_code=400, detail="Username or email already exists")
+            logger.error(f"Database error during registration: {str(e)}")
+            raise HTTPException(status_code=500, detail="Registration failed")
+        except aiomysql.MySQLError as e:
+            logger.error(f"Database error during registration: {str(e)}")
+            raise HTTPException(status_code=500, detail="Registration failed")
         
         user_id = cursor.lastrowid
-        
-        # Fetch the created user
-        cursor.execute(
-            "SELECT user_id, username, email, first_name, last_name, created_at, last_login FROM users WHERE user_id = %s",
-            (user_id,)
-        )
-        created_user = cursor.fetchone()
-        
-        # Create access token
-        access_token = create_access_token({"user_id": user_id, "username": user.username})
-        
-        return TokenResponse(
-            access_token=access_token,
-            token_type="bearer",
-            user=UserResponse(**created_user)
-        )
     
-    except mysql.connector.Error as e:
-        conn.rollback()
-        logger.error(f"Database error during registration: {str(e)}")
-        raise HTTPException(status_code=500, detail="Registration failed")
-    finally:
-        cursor.close()
-        conn.close()
+    # Create access token
+    access_token = create_access_token({"user_id": user_id, "username": user.username})
+    
+    return TokenResponse(
+        access_token=access_token,
+        token_type="bearer",
+        user=UserResponse(
+            user_id=user_id,
+            username=user.username,
+            email=user.email,
+            first_name=user.first_name,
+            last_name=user.last_name,
+            created_at=datetime.utcnow(),
+            last_login=None
+        )
+    )
 
 
 @app.post("/login", response_model=TokenResponse)
-async def login(credentials: UserLogin):
+async def login(credentials: UserLogin, background_tasks: BackgroundTasks):
     """Login user"""
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    try:
+    async with get_db_connection() as conn, conn.cursor(aiomysql.DictCursor) as cursor:
         # Fetch user
-        cursor.execute(
-            "SELECT * FROM users WHERE username = %s AND is_active = TRUE",
+        await cursor.execute(
+            """
+            SELECT user_id, username, email, first_name, last_name, password_hash, created_at
+            FROM users
+            WHERE username = %s AND is_active = TRUE
+            """,
             (credentials.username,)
         )
-        user = cursor.fetchone()
-        
-        if not user or not verify_password(credentials.password, user['password_hash']):
-            raise HTTPException(status_code=401, detail="Invalid username or password")
-        
-        # Update last login
-        cursor.execute(
-            "UPDATE users SET last_login = NOW() WHERE user_id = %s",
-            (user['user_id'],)
-        )
-        conn.commit()
-        
-        # Create access token
-        access_token = create_access_token({
-            "user_id": user['user_id'],
-            "username": user['username']
-        })
-        
-        return TokenResponse(
-            access_token=access_token,
-            token_type="bearer",
-            user=UserResponse(
-                user_id=user['user_id'],
-                username=user['username'],
-                email=user['email'],
-                first_name=user['first_name'],
-                last_name=user['last_name'],
-                created_at=user['created_at'],
-                last_login=datetime.utcnow()
-            )
-        )
+        user = await cursor.fetchone()
+    
+    if not user or not await verify_password(credentials.password, user['password_hash']):
+        raise HTTPException(status_code=401, detail="Invalid username or password")
     
-    finally:
-        cursor.close()
-        conn.close()
+    # Update last login once the token has been returned
+    background_tasks.add_task(update_last_login, user['user_id'])
+    
+    # Create access token
+    access_token = create_access_token({
+        "user_id": user['user_id'],
+        "username": user['username']
+    })
+    
+    return TokenResponse(
+        access_token=access_token,
+        token_type="bearer",
+        user=UserResponse(
+            user_id=user['user_id'],
+            username=user['username'],
+            email=user['email'],
+            first_name=user['first_name'],
+            last_name=user['last_name'],
+            created_at=user['created_at'],
+            last_login=datetime.utcnow()
+        )
+    )
 
 
 @app.get("/me", response_model=UserResponse)
 async def get_me(current_user: dict = Depends(get_current_user)):
     """Get current user info"""
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    try:
-        cursor.execute(
+    async with get_db_connection() as conn, conn.cursor(aiomysql.DictCursor) as cursor:
+        await cursor.execute(
             "SELECT user_id, username, email, first_name, last_name, created_at, last_login FROM users WHERE user_id = %s",
             (current_user['user_id'],)
         )
-        user = cursor.fetchone()
-        return UserResponse(**user)
-    finally:
-        cursor.close()
-        conn.close()
+        user = await cursor.fetchone()
+    
+    return UserResponse(**user)
 
 
 @app.post("/generate-title", response_model=TitleResponse)
@@ -464,17 +803,17 @@ async def generate_single_title(
     current_user: dict = Depends(get_current_user)
 ):
     """Generate a title for a single paragraph"""
-    if summarizer is None:
+    if model is None:
         raise HTTPException(status_code=503, detail="Model not loaded yet")
 
     try:
-        result_data = generate_title(
+        result_data = await generate_title(
             request.paragraph, request.max_length, request.min_length)
         
         # Save to database if requested
         result_id = None
         if request.save_result:
-            result_id = save_result_to_db(current_user['user_id'], result_data)
+            result_id = await save_result_to_db(current_user['user_id'], result_data)
         
         result = TitleResult(**result_data, result_id=result_id, created_at=datetime.utcnow())
         
@@ -497,24 +836,23 @@ async def generate_multiple_titles(
     current_user: dict = Depends(get_current_user)
 ):
     """Generate titles for multiple paragraphs"""
-    if summarizer is None:
+    if model is None:
         raise HTTPException(status_code=503, detail="Model not loaded yet")
 
     try:
         total_start = time.time()
         results = []
 
-        for paragraph in request.paragraphs:
-            if paragraph.strip():
-                result_data = generate_title(
-                    paragraph, request.max_length, request.min_length)
-                
-                result_id = None
-                if request.save_results:
-                    result_id = save_result_to_db(current_user['user_id'], result_data)
-                
-                result = TitleResult(**result_data, result_id=result_id, created_at=datetime.utcnow())
-                results.append(result)
+        titles = await generate_titles(
+            request.paragraphs, request.max_length, request.min_length)
+
+        result_ids = [None] * len(titles)
+        if request.save_results:
+            result_ids = await save_results_to_db(current_user['user_id'], titles)
+
+        for result_data, result_id in zip(titles, result_ids):
+            result = TitleResult(**result_data, result_id=result_id, created_at=datetime.utcnow())
+            results.append(result)
 
         total_time = (time.time() - total_start) * 1000
 
@@ -535,43 +873,55 @@ async def generate_multiple_titles(
 
 @app.get("/saved-results", response_model=SavedResultsResponse)
 async def get_saved_results(
-    limit: int = 50,
-    offset: int = 0,
+    limit: int = Query(50, ge=1, le=100),
+    after: Optional[int] = None,
     current_user: dict = Depends(get_current_user)
 ):
-    """Get user's saved results"""
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
+    """Get user's saved results, newest first.
+
+    Pages are keyed on result_id, which grows with created_at: pass the
+    previous page's next_cursor as `after` to get the following page.
+    """
+    user_id = current_user['user_id']
+    cursor_filter = ""
+    params = [user_id]
+    if after is not None:
+        cursor_filter = "AND result_id < %s"
+        params.append(after)
+    params.append(limit)
     
-    try:
-        cursor.execute("""
+    async with get_db_connection() as conn, conn.cursor(aiomysql.DictCursor) as cursor:
+        await cursor.execute(f"""
             SELECT result_id, paragraph, generated_title as title, status, confidence,
                    processing_time_ms, character_count, word_count, created_at
             FROM saved_results
-            WHERE user_id = %s
-            ORDER BY created_at DESC
-            LIMIT %s OFFSET %s
-        """, (current_user['user_id'], limit, offset))
+            WHERE user_id = %s {cursor_filter}
+            ORDER BY result_id DESC
+            LIMIT %s
+        """, params)
         
-        results = cursor.fetchall()
+        results = await cursor.fetchall()
         
-        # Get total count
-        cursor.execute(
-            "SELECT COUNT(*) as total FROM saved_results WHERE user_id = %s",
-            (current_user['user_id'],)
-        )
-        total = cursor.fetchone()['total']
-        
-        return SavedResultsResponse(
-            success=True,
-            data=[TitleResult(**r) for r in results],
-            total_results=total,
-            message=f"Retrieved {len(results)} saved results"
-        )
+        # Only the first page reports the total count
+        total = None
+        if after is None:
+            await cursor.execute(
+                "SELECT COUNT(*) as total FROM saved_results WHERE user_id = %s",
+                (user_id,)
+            )
+            total = (await cursor.fetchone())['total']
     
-    finally:
-        cursor.close()
-        conn.close()
+    next_cursor = None
+    if results and len(results) == limit:
+        next_cursor = results[-1]['result_id']
+    
+    return SavedResultsResponse(
+        success=True,
+        data=[TitleResult(**r) for r in results],
+        total_results=total,
+        next_cursor=next_cursor,
+        message=f"Retrieved {len(results)} saved results"
+    )
 
 
 @app.delete("/saved-results/{result_id}")
@@ -580,24 +930,17 @@ async def delete_saved_result(
     current_user: dict = Depends(get_current_user)
 ):
     """Delete a saved result"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute(
+    async with get_db_connection() as conn, conn.cursor() as cursor:
+        await cursor.execute(
             "DELETE FROM saved_results WHERE result_id = %s AND user_id = %s",
             (result_id, current_user['user_id'])
         )
-        conn.commit()
-        
-        if cursor.rowcount == 0:
-            raise HTTPException(status_code=404, detail="Result not found")
-        
-        return {"success": True, "message": "Result deleted successfully"}
+        deleted = cursor.rowcount
+    
+    if deleted == 0:
+        raise HTTPException(status_code=404, detail="Result not found")
     
-    finally:
-        cursor.close()
-        conn.close()
+    return {"success": True, "message": "Result deleted successfully"}
 
 
 @app.get("/health")
@@ -605,7 +948,7 @@ async def health_check():
     """Detailed health check"""
     return {
         "status": "healthy",
-        "model_loaded": summarizer is not None,
+        "model_loaded": model is not None,
         "database_connected": db_pool is not None,
         "model_name": "ai_paragraph_titler_model"
     }
@@ -613,4 +956,12 @@ async def health_check():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    # Spawned workers re-import this module and size their budgets from it
+    os.environ["UVICORN_WORKERS"] = str(UVICORN_WORKERS)
+    uvicorn.run(
+        "main:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=UVICORN_WORKERS,
+        reload=UVICORN_RELOAD
+    )
@@ -19,6 +19,14 @@ Write-Host ""
 Write-Host "📦 Installing dependencies..." -ForegroundColor Yellow
 pip install -r requirements.txt
 
+Write-Host ""
+Write-Host "⚙️  Exporting model to ONNX..." -ForegroundColor Yellow
+if (Test-Path "onnx_model") {
+    Write-Host "✅ ONNX model already exported" -ForegroundColor Green
+} else {
+    python export_onnx.py
+}
+
 Write-Host ""
 Write-Host "📝 Checking for .env file..." -ForegroundColor Yellow
 if (Test-Path ".env") {
@@ -77,8 +77,13 @@ export const paragraphAPI = {
     return response.data;
   },
   
-  getHistory: async (limit = 50, offset = 0) => {
-    const response = await api.get(`/saved-results?limit=${limit}&offset=${offset}`);
+  // Pass the previous page's next_cursor as `after` to load the next page
+  getHistory: async (limit = 50, after = null) => {
+    const params = { limit };
+    if (after !== null) {
+      params.after = after;
+    }
+    const response = await api.get('/saved-results', { params });
     return response.data;
   },
   